@@ -1,65 +1,190 @@
 """ This python script contains multiple helper functions that are used throughout the experiment.  """
 
+import copy
 import os
+import pickletools
 import re
-import time
-from functools import wraps
-
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from time import perf_counter_ns
 
 import cloudpickle
+import numpy as np
 import pandas as pd
 import yaml
-from pycaret.classification import setup
 #from sdmetrics.utils import get_columns_from_metadata, get_type_from_column_meta
 
+# Patterns and lookup used to convert string values, see convert_and_clean_dict(),
+# _FLOAT_RE follows the literals float() accepts, including digit separators
+_INT_RE = re.compile(r"-?\d+")
+_DIGITS = r"\d(?:_?\d)*"
+_FLOAT_RE = re.compile(
+    r"[+-]?(?:{d}(?:\.(?:{d})?)?|\.{d})(?:[eE][+-]?{d})?|[+-]?(?:inf|infinity|nan)".format(d=_DIGITS),
+    re.IGNORECASE,
+)
+_SPECIAL_VALUES = {"true": True, "false": False, "none": None}
+
+# Pattern for the part of a synthetic data filename after the dataset id,
+# see get_synthetic_filepaths_from_original_data_id()
+_SD_SUFFIX_RE = re.compile(r"Q\d+_\d+\.csv$")
+
+# Patterns used to parse the CTGAN loss output, see extract_loss_info_from_stdout()
+_EPOCH_LINE_RE = re.compile(
+    r"^Epoch (\d+),\s*Loss G:\s*([^,]+),\s*Loss D:\s*(.+)$", re.MULTILINE
+)
+_EMPTY_LOSS_DF = pd.DataFrame(
+    {
+        "Epoch": np.array([], dtype=np.int32),
+        "Loss_G": np.array([], dtype=np.float32),
+        "Loss_D": np.array([], dtype=np.float32),
+    }
+)
+
+
+def _iter_filepaths(path: str, extension=None):
+    """Yields the path of every file in the directory tree of 'path',
+    optionally only the files ending with 'extension'.
+
+    Like os.walk(), symlinks to directories are not followed and
+    directories that can not be listed, e.g. a missing 'path', are skipped.
+    """
+
+    try:
+        entries = os.scandir(path)
+    except OSError:
+        return
+
+    with entries:
+        for entry in entries:
+            # DirEntry caches the file type, so no extra stat call is needed
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_filepaths(entry.path, extension)
+            elif entry.is_file() and (extension is None or entry.name.endswith(extension)):
+                yield entry.path
+
 
-def getPicklesFromDir(path: str) -> list[dict]:
+def _load_pickle(filepath: str):
+    """Reads the whole file in one go and unpickles it from memory."""
+
+    with open(filepath, "rb") as file:
+        data = file.read()
+
+    return cloudpickle.loads(data)
+
+
+def getPicklesFromDir(path: str, extension: str = None) -> list[dict]:
     """Returns all pickles in the provided path as a list.
 
+    The files are independent of each other, so they are loaded concurrently.
+
     In:
         'path': the relative path to the destination directory
+        'extension': only load the files ending with this extension, e.g. '.pkl',
+                     all files are loaded when None
 
     Out:
         List of all pickles in the provided path
 
     """
 
-    pickles = []
+    filepaths = list(_iter_filepaths(path, extension))
 
-    for dirname, _, filenames in os.walk(path):
-        for filename in filenames:
-            folder = os.path.join(dirname, filename)
-            pickle_obj = cloudpickle.load(open(folder, "rb"))
-            pickles.append(pickle_obj)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        pickles = list(executor.map(_load_pickle, filepaths))
 
     return pickles
 
 
+def compact_pickles(path: str, extension: str = ".pkl") -> None:
+    """Rewrites all pickles in the provided path with pickletools.optimize(),
+    which removes unused memo opcodes so the files are smaller and faster to load.
+
+    Meant to be run once on already stored pickles, the content is unchanged.
+
+    In:
+        'path': the relative path to the destination directory
+        'extension': only compact the files ending with this extension,
+                     all files are compacted when None
+
+    """
+
+    for filepath in _iter_filepaths(path, extension):
+        with open(filepath, "rb") as file:
+            data = file.read()
+
+        optimized = pickletools.optimize(data)
+        if len(optimized) >= len(data):
+            continue
+
+        # Write to a temporary file first so a failed write can not corrupt the pickle
+        tmp_filepath = filepath + ".tmp"
+        try:
+            with open(tmp_filepath, "wb") as file:
+                file.write(optimized)
+            os.replace(tmp_filepath, filepath)
+        finally:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+
+
+EXPERIMENT_CONFIG_PATH = "../experiment_config.yml"
+
+
+def _file_state(path: str) -> tuple:
+    """Returns the absolute path, modification time in ns and size of 'path',
+    used as cache key so a changed file or a different working directory is noticed."""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+@lru_cache(maxsize=1)
+def _load_experiment_config(path: str, mtime_ns: int, size: int) -> dict:
+    """Parses the YAML experiment configuration, cached on the absolute path,
+    modification time and size of the file so edits to the config are picked up.
+
+    """
+
+    # Prefer the libyaml backed loader when available, it parses considerably faster
+    Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    with open(path, "r") as file:
+        config = yaml.load(file, Loader=Loader)
+
+    return config
+
+
 def getExperimentConfig() -> dict:
     """Returns the YAML experiment configuration that contains all
     global experiment settings
 
+    The file is only parsed again when it has been modified since the last call.
     """
 
-    with open("../experiment_config.yml", "r") as file:
-        config = yaml.safe_load(file)
+    config = _load_experiment_config(*_file_state(EXPERIMENT_CONFIG_PATH))
 
-    return config
+    # Hand out a copy so callers can not alter the cached configuration
+    return copy.deepcopy(config)
 
 
-def run_pycaret_setup(data_path: str, setup_param: dict, meta: dict=None):
+def run_pycaret_setup(data_path: str, setup_param: dict, meta: dict=None, engine: str="c"):
     """A wrapper function for the experiment to run pycaret setup()
 
     sends the correct params to the pycaret setup() function and
     returns its return value.
     Thus enabling iterative runs of the settings.
+
+    'engine' selects the pandas csv parser, engine="pyarrow" reads multi-threaded
+    but infers the column types itself before 'cols_dtype' is applied,
+    so the default C parser is kept for reproducible results.
     """
+    # pycaret is slow to import, so it is only loaded when it is needed
+    from pycaret.classification import setup
+
     cols_dtype = None
     if meta != None and 'cols_dtype' in meta:
         cols_dtype = meta['cols_dtype']
     
-    data=pd.read_csv(data_path, dtype=cols_dtype) 
+    data=pd.read_csv(data_path, dtype=cols_dtype, engine=engine) 
 
     pycaret_setup = setup(data=data, **setup_param)
 
@@ -87,41 +212,40 @@ def timefunction(func):
 
     @wraps(func)
     def timefunction_wrapper(*args, **kwargs):
-        start_time = time.perf_counter()
+        # Integer nanosecond timestamps, converted to seconds only once
+        start_time = perf_counter_ns()
         score = func(*args, **kwargs)
-        end_time = time.perf_counter()
+        end_time = perf_counter_ns()
 
-        total_time = end_time - start_time
+        total_time = (end_time - start_time) * 1e-9
         return {"score": score, "time": total_time}
 
     return timefunction_wrapper
 
 
-def translate_model_name(model: str) -> str:
-    model_names = {
-        "lr": "Logistic Regression",
-        "knn": "K-Nearest Neighbor",
-        "nb": "Naive Bayes",
-        "svm": "SVM",
-        "rbfsvm": "SVM-RBF",
-        "gpc": "Gaussian Process Classifier",
-        "mlp": "Multilayer Perceptron",
-        "ridge": "Ridge Classifier",
-        "rf": "Random Forest",
-        "dt": "Decision Tree Classifier",
-        "et": "Extra Trees Classifier",
-        "qda": "Quadratic Discriminant Analysis",
-        "ada": "Ada Boost Clasifier",
-        "gbc": "Gradient Boosting Classifier",
-        "lda": "Linear Dicriminant Analysis",
-        "xgboost": "Extreme Gradient Boosting",
-        "lightgbm": "Light Gradient Boosting Machine",
-    }
+_MODEL_NAMES = {
+    "lr": "Logistic Regression",
+    "knn": "K-Nearest Neighbor",
+    "nb": "Naive Bayes",
+    "svm": "SVM",
+    "rbfsvm": "SVM-RBF",
+    "gpc": "Gaussian Process Classifier",
+    "mlp": "Multilayer Perceptron",
+    "ridge": "Ridge Classifier",
+    "rf": "Random Forest",
+    "dt": "Decision Tree Classifier",
+    "et": "Extra Trees Classifier",
+    "qda": "Quadratic Discriminant Analysis",
+    "ada": "Ada Boost Clasifier",
+    "gbc": "Gradient Boosting Classifier",
+    "lda": "Linear Dicriminant Analysis",
+    "xgboost": "Extreme Gradient Boosting",
+    "lightgbm": "Light Gradient Boosting Machine",
+}
+
 
-    if model in model_names:
-        return model_names[model]
-    else:
-        return None
+def translate_model_name(model: str) -> str:
+    return _MODEL_NAMES.get(model)
 
 
 def unravel_metric_report(report_dict: dict):
@@ -134,16 +258,19 @@ def unravel_metric_report(report_dict: dict):
     Returns:
         dict: Flattened dictionary with key-value pairs.
     """
-    flat_dict = {}
+    return dict(_flatten_report_items(report_dict))
+
+
+def _flatten_report_items(report_dict: dict):
+    """Yields the (key, value) pairs of the report, where the class rows
+    are flattened one level into '<row>_<metric>' keys."""
     for key, value in report_dict.items():
         if isinstance(value, dict):
+            prefix = f"{key}_"
             for inner_key, inner_value in value.items():
-                flat_key = f"{key}_{inner_key}"
-                flat_dict[flat_key] = inner_value
+                yield prefix + inner_key, inner_value
         else:
-            flat_dict[key] = value
-
-    return flat_dict
+            yield key, value
 
 
 def extract_loss_info_from_stdout(input_str: str) -> dict:
@@ -152,38 +279,38 @@ def extract_loss_info_from_stdout(input_str: str) -> dict:
     """
     output_dict = {}
 
-    # Define a regular expression pattern to match each block of text between #START# and #END#
-    pattern = r"#START#\n(.+?)\n(.+?)#END#"
+    # The blocks are delimited by fixed strings, so plain string splitting is enough
+    for block in input_str.split("#START#\n")[1:]:
+        body, end_found, _ = block.partition("#END#")
+        # Skip incomplete blocks that were never closed by #END#
+        if not end_found:
+            continue
 
-    # Use the regular expression to find all matches in the input string
-    matches = re.findall(pattern, input_str, re.DOTALL)
+        # The key is the first line of the block, stripped of any whitespace
+        # and the data string is the rest of the block
+        dataset_id, _, data_str = body.partition("\n")
+        dataset_id = dataset_id.strip()
 
-    # Iterate over the matches and extract the dataset id and data string for each block
-    for match in matches:
-        dataset_id = match[0].strip()  # The key is the first line of the block, stripped of any whitespace
-        data_str = match[1]     # The data string is the rest of the block
+        # Extract the epoch and the corresponding Loss G and Loss D values in a single pass
+        triples = _EPOCH_LINE_RE.findall(data_str)
 
-        # Extract the values for each epoch and the corresponding loss values for Loss G and Loss D
-        epoch_list = [
-            int(re.findall(r"Epoch (\d+)", line)[0])
-            for line in data_str.split("\n")
-            if line.startswith("Epoch")
-        ]
+        # Blocks without any epoch lines share the same empty, typed DataFrame layout
+        if not triples:
+            output_dict[dataset_id] = _EMPTY_LOSS_DF.copy()
+            continue
 
-        loss_g_list = [
-            float(re.findall(r"Loss G: (.+?),", line)[0])
-            for line in data_str.split("\n")
-            if line.startswith("Epoch")
-        ]
-        loss_d_list = [
-            float(re.findall(r"Loss D: (.+)", line)[0])
-            for line in data_str.split("\n")
-            if line.startswith("Epoch")
-        ]
+        epoch_list, loss_g_list, loss_d_list = zip(*triples)
+        n_epochs = len(triples)
 
-        # Use the extracted values to create a Pandas DataFrame
+        # Convert straight into typed arrays so pandas can wrap them without copying,
+        # single precision is plenty for the loss values
         df = pd.DataFrame(
-            {"Epoch": epoch_list, "Loss_G": loss_g_list, "Loss_D": loss_d_list}
+            {
+                "Epoch": np.fromiter(map(int, epoch_list), dtype=np.int32, count=n_epochs),
+                "Loss_G": np.fromiter(map(float, loss_g_list), dtype=np.float32, count=n_epochs),
+                "Loss_D": np.fromiter(map(float, loss_d_list), dtype=np.float32, count=n_epochs),
+            },
+            copy=False,
         )
         # Add the DataFrame to the dictionary with the key value being the string after #START#
         output_dict[dataset_id] = df
@@ -191,6 +318,8 @@ def extract_loss_info_from_stdout(input_str: str) -> dict:
     return output_dict
 
 def create_loss_plot(dataset_id:str, loss_df:pd.DataFrame):
+    # matplotlib is slow to import, so it is only loaded when a plot is created
+    import matplotlib.pyplot as plt
 
     # Create the plot
     fig, ax = plt.subplots()
@@ -209,7 +338,7 @@ def extract_filenames(directory, extension='.csv', return_relative_path=False):
 
     Args:
         directory (str): The path to the directory to search for files.
-        extension (str): The file extension to search for. Defaults to '.txt'.
+        extension (str or tuple): The file extension(s) to search for. Defaults to '.csv'.
         return_relative_path (bool): Whether to return the filenames with the directory path
                               relative to the current working directory. Defaults to False.
                               False: only return the filenames (no path).
@@ -217,17 +346,47 @@ def extract_filenames(directory, extension='.csv', return_relative_path=False):
     Returns:
         list: A list of filenames in the directory with the specified extension.
     """
-    # Get the list of files in the directory
-    files = os.listdir(directory)
-
-    # Filter the list by file extension
-    files_filtered = [file for file in files if file.endswith(extension)]
+    # str.endswith accepts a tuple, which lets several extensions be matched in one call
+    if not isinstance(extension, (str, tuple)):
+        extension = tuple(extension)
+
+    # Scan the directory once and filter the files by extension,
+    # DirEntry.path already holds the path joined with the directory
+    with os.scandir(directory) as entries:
+        files_filtered = [
+            entry.path if return_relative_path else entry.name
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(extension)
+        ]
 
     # Return the list of filenames
-    if return_relative_path:
-        return [os.path.join(directory, file) for file in files_filtered]
-    else:
-        return files_filtered
+    return files_filtered
+
+@lru_cache(maxsize=8)
+def _list_synthetic_filenames(sd_dir: str, mtime_ns: int, size: int) -> tuple:
+    """Returns the csv filenames in 'sd_dir', cached on the absolute path, modification time
+    and size of the directory so the directory is only rescanned when files are added or removed.
+
+    """
+    return tuple(extract_filenames(sd_dir))
+
+@lru_cache(maxsize=128)
+def _filter_synthetic_filenames(original_data_id: str, sd_dir: str, mtime_ns: int, size: int) -> tuple:
+    """Returns the synthetic data filenames in 'sd_dir' generated on the original data id,
+    cached on the modification time of the directory so new files are picked up.
+
+    """
+    synthetic_data_files = _list_synthetic_filenames(sd_dir, mtime_ns, size)
+
+    # Synthetic data is named SD<id>Q<quantity>_<index>.csv, the cheap prefix check
+    # discards most filenames so only the remaining ones are matched with the regex
+    prefix = "SD" + original_data_id[1:]
+    prefix_len = len(prefix)
+    return tuple(
+        filename
+        for filename in synthetic_data_files
+        if filename.startswith(prefix) and _SD_SUFFIX_RE.match(filename, prefix_len)
+    )
 
 def get_synthetic_filepaths_from_original_data_id(original_data_id):
     """
@@ -243,49 +402,31 @@ def get_synthetic_filepaths_from_original_data_id(original_data_id):
     """
 
     config=getExperimentConfig()
-    # Get the list of synthetic data filenames
-    synthetic_data_files = extract_filenames(config['folders']['sd_dir'])
+    sd_dir = config['folders']['sd_dir']
 
-    # rule to match for the dataset id
-    regex_rule = r'SD({})Q\d+_\d+\.csv'.format(original_data_id[1:])
-    # Filter the list by the dataset id
-    files_filtered = [filename for filename in synthetic_data_files if re.match(regex_rule, filename)]
+    files_filtered = _filter_synthetic_filenames(original_data_id, *_file_state(sd_dir))
 
-    return files_filtered
+    return list(files_filtered)
 
 def convert_and_clean_dict(dictionary:dict) -> dict:
     # Helper function to convert string values to their appropriate data types
     def convert(value):
-        # If the value is an integer, convert it to int
-        if value.isdigit():
-            return int(value)
-        # if the value is a negative integer
-        if isinstance(value, str) and value.lstrip('-').isdigit():
+        # Convert string 'True', 'False' and 'None' to their python values
+        special = _SPECIAL_VALUES.get(value.lower(), value)
+        if special is not value:
+            return special
+        # If the value is a (negative) integer, convert it to int
+        if _INT_RE.fullmatch(value):
             return int(value)
-        # If the value is a float, try converting it to float
-        try:
+        # If the value is a float, convert it to float, float() ignores surrounding whitespace
+        if _FLOAT_RE.fullmatch(value.strip()):
             return float(value)
-        except ValueError:
-            pass
-        # Convert string 'True' and 'False' to boolean True and False
-        if value.lower() == "true":
-            return True
-        if value.lower() == "false":
-            return False
-        # Convert string 'None' to None
-        if value.lower() == "none":
-            return None
         # Return value unchanged if it cannot be converted to any other data type
         return value
 
-    # Create an empty dictionary to store cleaned key-value pairs
-    cleaned_dict = {}
-
-    # Iterate over each key-value pair in the input dictionary
-    for key, value in dictionary.items():
-        # If the value is not empty, convert it and add the key-value pair to the cleaned_dict
-        if value.strip() != "" and value.strip() != '{}':
-            cleaned_dict[key] = convert(value)
-
-    # Return the cleaned dictionary with values converted to their appropriate data types
-    return cleaned_dict
+    # Convert the values that are not empty and return the cleaned dictionary
+    return {
+        key: convert(value)
+        for key, value in dictionary.items()
+        if value.strip() not in ("", "{}")
+    }
@@ -1,14 +1,29 @@
+import os
+import pickle
+import pickletools
+import sys
+
 import pandas as pd
 import numpy as np
 import pytest
 
-from src.utils import (get_categorical_indices, 
-                       unravel_metric_report, 
+# quick fix for ModuleNotFoundError
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/../src")
+from src.utils import (unravel_metric_report, 
                        extract_loss_info_from_stdout,
-                       convert_and_clean_dict)
+                       convert_and_clean_dict,
+                       compact_pickles,
+                       getPicklesFromDir,
+                       getExperimentConfig,
+                       extract_filenames,
+                       get_synthetic_filepaths_from_original_data_id)
+import src.utils as utils
 
 
+@pytest.mark.skip(reason="get_categorical_indices is commented out in src/utils.py")
 def test_get_categorical_indices():
+    from src.utils import get_categorical_indices
+
     data = pd.DataFrame(
         {
             "A": [1, 2, 3],
@@ -118,6 +133,16 @@ def test_extract_loss_info_from_stdout(input_str):
     for key in expected_dict.keys():
         assert np.allclose(result_dict[key].values, expected_dict[key].values)
 
+def test_extract_loss_info_from_stdout_empty_block():
+    input_str = """#START#
+SD0Q1_0
+#END#"""
+    result_dict = extract_loss_info_from_stdout(input_str)
+
+    assert list(result_dict.keys()) == ['SD0Q1_0']
+    assert result_dict['SD0Q1_0'].empty
+    assert list(result_dict['SD0Q1_0'].columns) == ['Epoch', 'Loss_G', 'Loss_D']
+
 def test_clean_and_convert_dict():
 
     # Test with the given example
@@ -157,4 +182,152 @@ def test_clean_and_convert_dict():
 
     output = convert_and_clean_dict(input_dict)
 
-    assert expected == output, f"The ouput is not equal to the expected values, \nExpected:\n{expected}\nOutput:\n{output}"
\ No newline at end of file
+    assert expected == output, f"The ouput is not equal to the expected values, \nExpected:\n{expected}\nOutput:\n{output}"
+
+def test_clean_and_convert_dict_numeric_formats():
+    input_dict = {
+        'exponent': '1e-5',
+        'exponent_upper': '2.5E3',
+        'plus_sign': '+5',
+        'leading_dot': '.5',
+        'separator': '1_000',
+        'leading_space': ' 1.5',
+        'trailing_space': '1.5 ',
+        'trailing_newline': '5\n',
+        'inf': '-inf',
+        'nan': 'nan ',
+        'none_upper': 'NONE',
+        'text_with_digit': 'l2',
+    }
+
+    output = convert_and_clean_dict(input_dict)
+
+    assert output['exponent'] == 1e-5 and isinstance(output['exponent'], float)
+    assert output['exponent_upper'] == 2500.0
+    assert output['plus_sign'] == 5.0 and isinstance(output['plus_sign'], float)
+    assert output['leading_dot'] == 0.5
+    assert output['separator'] == 1000.0
+    assert output['leading_space'] == 1.5
+    assert output['trailing_space'] == 1.5
+    assert output['trailing_newline'] == 5.0 and isinstance(output['trailing_newline'], float)
+    assert output['inf'] == float('-inf')
+    assert np.isnan(output['nan'])
+    assert output['none_upper'] is None
+    assert output['text_with_digit'] == 'l2'
+
+
+def test_compact_pickles(tmp_path):
+    shared = {"precision": 0.8, "recall": 0.9}
+    objects = {
+        "a.pkl": {"id": "D0", "report": [shared, shared], "cols": ["A", "B"]},
+        "b.pkl": {"id": "D1", "scores": np.arange(5), "name": "titanic"},
+    }
+    for filename, obj in objects.items():
+        with open(tmp_path / filename, "wb") as file:
+            pickle.dump(obj, file)
+    (tmp_path / ".gitkeep").write_text("")
+    original_bytes = (tmp_path / "a.pkl").read_bytes()
+
+    compact_pickles(str(tmp_path))
+
+    # The shared dict leaves unused memo opcodes that the rewrite removes
+    compacted_bytes = (tmp_path / "a.pkl").read_bytes()
+    assert len(compacted_bytes) < len(original_bytes)
+    assert compacted_bytes == pickletools.optimize(original_bytes)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".gitkeep", "a.pkl", "b.pkl"]
+
+    loaded = {obj["id"]: obj for obj in getPicklesFromDir(str(tmp_path), extension=".pkl")}
+    assert loaded["D0"] == objects["a.pkl"]
+    assert loaded["D1"]["name"] == "titanic"
+    assert np.array_equal(loaded["D1"]["scores"], objects["b.pkl"]["scores"])
+
+
+def test_get_experiment_config_cache(tmp_path, monkeypatch):
+    config_path = tmp_path / "experiment_config.yml"
+    config_path.write_text("folders:\n  sd_dir: ../data/synthetic/\n")
+    monkeypatch.setattr(utils, "EXPERIMENT_CONFIG_PATH", str(config_path))
+
+    config = getExperimentConfig()
+    assert config == {"folders": {"sd_dir": "../data/synthetic/"}}
+
+    # Altering the returned config must not alter the cached config
+    config["folders"]["sd_dir"] = "changed"
+    assert getExperimentConfig()["folders"]["sd_dir"] == "../data/synthetic/"
+
+    # A modified file, with a new mtime, is parsed again
+    config_path.write_text("folders:\n  sd_dir: ../data/other/\n")
+    mtime = os.stat(config_path).st_mtime + 10
+    os.utime(config_path, (mtime, mtime))
+    assert getExperimentConfig()["folders"]["sd_dir"] == "../data/other/"
+
+    # An edit that keeps the same mtime is still noticed through the file size
+    mtime_ns = os.stat(config_path).st_mtime_ns
+    config_path.write_text("folders:\n  sd_dir: ../data/restored/\n")
+    os.utime(config_path, ns=(mtime_ns, mtime_ns))
+    assert getExperimentConfig()["folders"]["sd_dir"] == "../data/restored/"
+
+
+def test_extract_filenames(tmp_path):
+    for filename in ["a.csv", "b.csv", "c.txt", "d.pkl"]:
+        (tmp_path / filename).write_text("")
+    # directories are not returned, even with a matching extension
+    (tmp_path / "folder.csv").mkdir()
+
+    assert sorted(extract_filenames(str(tmp_path))) == ["a.csv", "b.csv"]
+    assert sorted(extract_filenames(str(tmp_path), extension=".txt")) == ["c.txt"]
+    assert sorted(extract_filenames(str(tmp_path), extension=(".txt", ".pkl"))) == ["c.txt", "d.pkl"]
+    assert sorted(extract_filenames(str(tmp_path), extension=[".csv", ".txt"])) == ["a.csv", "b.csv", "c.txt"]
+    assert sorted(extract_filenames(str(tmp_path), return_relative_path=True)) == [
+        os.path.join(str(tmp_path), "a.csv"),
+        os.path.join(str(tmp_path), "b.csv"),
+    ]
+
+
+def test_get_pickles_from_dir(tmp_path):
+    (tmp_path / "nested").mkdir()
+    for filepath, obj in [("a.pkl", {"id": "D0"}), ("nested/b.pkl", {"id": "D1"}), ("c.bin", {"id": "D2"})]:
+        with open(tmp_path / filepath, "wb") as file:
+            pickle.dump(obj, file)
+
+    all_ids = sorted(obj["id"] for obj in getPicklesFromDir(str(tmp_path)))
+    pkl_ids = sorted(obj["id"] for obj in getPicklesFromDir(str(tmp_path), extension=".pkl"))
+
+    assert all_ids == ["D0", "D1", "D2"]
+    assert pkl_ids == ["D0", "D1"]
+    assert getPicklesFromDir(str(tmp_path / "missing")) == []
+
+
+def test_get_pickles_from_dir_skips_directory_symlinks(tmp_path):
+    (tmp_path / "nested").mkdir()
+    with open(tmp_path / "nested" / "a.pkl", "wb") as file:
+        pickle.dump({"id": "D0"}, file)
+
+    try:
+        os.symlink(tmp_path / "nested", tmp_path / "linked", target_is_directory=True)
+    except OSError:
+        pytest.skip("creating symlinks is not permitted, e.g. on Windows without developer mode")
+
+    # symlinks to directories are not followed, as with os.walk()
+    assert getPicklesFromDir(str(tmp_path)) == [{"id": "D0"}]
+
+
+def test_get_synthetic_filepaths_from_original_data_id(tmp_path, monkeypatch):
+    sd_dir = tmp_path / "synthetic"
+    sd_dir.mkdir()
+    for filename in ["SD1Q100_0.csv", "SD10Q100_0.csv", "SD1Q100_0.csv.bak", "SD0Q100_0.csv"]:
+        (sd_dir / filename).write_text("")
+
+    config_path = tmp_path / "experiment_config.yml"
+    config_path.write_text(f"folders:\n  sd_dir: {sd_dir.as_posix()}/\n")
+    monkeypatch.setattr(utils, "EXPERIMENT_CONFIG_PATH", str(config_path))
+
+    files = get_synthetic_filepaths_from_original_data_id("D1")
+    assert files == ["SD1Q100_0.csv"]
+
+    # A second call is served from the cache and returns the same list
+    assert get_synthetic_filepaths_from_original_data_id("D1") == files
+
+    # Synthetic data generated after the first call is picked up
+    (sd_dir / "SD1Q500_1.csv").write_text("")
+    assert sorted(get_synthetic_filepaths_from_original_data_id("D1")) == ["SD1Q100_0.csv", "SD1Q500_1.csv"]